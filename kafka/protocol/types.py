@@ -130,7 +130,12 @@ class Bytes(AbstractType):
 
     @classmethod
     def repr(cls, value):
-        return repr(value[:100] + b'...' if value is not None and len(value) > 100 else value)
+        if value is not None and len(value) > 100:
+            value = value[:100] + b'...'
+        if isinstance(value, bytearray):
+            # Batch buffers from MemoryRecordsBuilder are bytearrays
+            value = bytes(value)
+        return repr(value)
 
 
 class Boolean(AbstractType):
@@ -103,6 +103,10 @@ def test_memory_records_v2():
     assert records.next_batch() is None
     assert records.next_batch() is None
 
+    # Sizes are still available once all batches were read
+    assert records.size_in_bytes() == 303
+    assert records.valid_bytes() == 299
+
 
 def test_memory_records_v1():
     data_bytes = b"".join(record_batch_data_v1) + b"\x00" * 4
@@ -158,6 +162,30 @@ def test_memory_records_v0():
     assert records.next_batch() is None
 
 
+def test_memory_records_memoryview():
+    data_bytes = b"".join(record_batch_data_v2) + b"\x00" * 4
+    records = MemoryRecords(memoryview(data_bytes))
+
+    assert records.size_in_bytes() == 303
+    assert records.valid_bytes() == 299
+
+    values = [rec.value for batch in records for rec in batch]
+    assert values == [b"123", b"", b"", b"123", b"hdr"]
+
+
+def test_memory_records_iter():
+    data_bytes = b"".join(record_batch_data_v1)
+    records = MemoryRecords(data_bytes)
+
+    assert next(records) is not None
+    assert records.next_batch() is not None
+    # Iteration continues from the current position
+    assert len(list(records)) == 2
+    assert records.has_next() is False
+    with pytest.raises(StopIteration):
+        next(records)
+
+
 def test_memory_records_corrupt():
     records = MemoryRecords(b"")
     assert records.size_in_bytes() == 0
@@ -178,6 +206,29 @@ def test_memory_records_corrupt():
         records.next_batch()
 
 
+def test_memory_records_corrupt_after_valid_batch():
+    data_bytes = (
+        record_batch_data_v0[0] +
+        b"\x00\x00\x00\x00\x00\x00\x00\x03"  # Offset=3
+        b"\x00\x00\x00\x03"  # Length=3
+        b"\xfe\xb0\x1d"  # Some random bytes
+    )
+    records = MemoryRecords(data_bytes)
+    assert records.valid_bytes() == len(record_batch_data_v0[0])
+    assert records.has_next() is True
+    assert records.next_batch() is not None
+    assert records.has_next() is True
+    with pytest.raises(CorruptRecordError):
+        records.next_batch()
+    # Iteration does not silently skip the corrupted batch
+    with pytest.raises(CorruptRecordError):
+        records.next_batch()
+
+    records = MemoryRecords(data_bytes)
+    with pytest.raises(CorruptRecordError):
+        list(records)
+
+
 @pytest.mark.parametrize("compression_type", [0, 1, 2, 3])
 @pytest.mark.parametrize("magic", [0, 1, 2])
 def test_memory_records_builder(magic, compression_type):
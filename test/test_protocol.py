@@ -7,7 +7,9 @@ from kafka.protocol.fetch import FetchRequest, FetchResponse
 from kafka.protocol.find_coordinator import FindCoordinatorRequest
 from kafka.protocol.message import Message, MessageSet, PartialMessage
 from kafka.protocol.metadata import MetadataRequest
+from kafka.protocol.produce import ProduceRequest
 from kafka.protocol.types import Int16, Int32, Int64, String, UnsignedVarInt32, CompactString, CompactArray, CompactBytes
+from kafka.record import MemoryRecordsBuilder
 
 
 def test_create_message():
@@ -332,3 +334,20 @@ def test_compact_data_structs():
     assert CompactBytes.decode(io.BytesIO(b'\x01')) == b''
     enc = CompactBytes.encode(b'foo')
     assert CompactBytes.decode(io.BytesIO(enc)) == b'foo'
+
+
+def test_encode_produce_request_from_builder_buffer():
+    builder = MemoryRecordsBuilder(magic=2, compression_type=0, batch_size=1024)
+    builder.append(timestamp=None, key=b"key", value=b"value")
+    builder.close()
+    buf = builder.buffer()
+
+    request = ProduceRequest[3](
+        transactional_id=None,
+        required_acks=1,
+        timeout=1000,
+        topics=[('foo', [(0, buf)])])
+    encoded = request.encode()
+    assert isinstance(encoded, bytes)
+    assert encoded.endswith(Int32.encode(len(buf)) + bytes(buf))
+    assert 'bytearray' not in repr(request)